@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-import difflib
+import numpy as np
+from rapidfuzz import process, fuzz
 from io import BytesIO
 
 st.set_page_config(page_title="Subchassis Mapper", layout="wide")
@@ -22,26 +23,48 @@ uploaded_dynamic = st.file_uploader("Upload Dynamic Planning Excel File", type=[
 uploaded_reference = st.file_uploader("Upload Subchassis Reference Excel File", type=["xlsx"])
 
 def fuzzy_match_column(possible_names, columns):
-    matches = {}
-    for name in possible_names:
-        match = difflib.get_close_matches(name, columns, n=1, cutoff=0.6)
-        if match:
-            matches[name] = match[0]
+    if not columns:
+        return []
+    # Exact (case-insensitive) column names need no fuzzy scoring
+    lc_map = {}
+    for col in columns:
+        lc_map.setdefault(col.lower(), col)
+    matches = {name: lc_map[name.lower()] for name in possible_names if name.lower() in lc_map}
+    remaining = [name for name in possible_names if name not in matches]
+    if remaining:
+        # Score every (keyword, column) pair in one call; scores below the cutoff come back as 0
+        scores = process.cdist(remaining, columns, scorer=fuzz.ratio, score_cutoff=60)
+        best = np.argmax(scores, axis=1)
+        found = scores.max(axis=1) >= 60
+        matches.update({name: columns[i] for name, i, ok in zip(remaining, best, found) if ok})
     return list(set(matches.values()))
 
+@st.cache_data(show_spinner=False)
+def load_sheet_names(file_bytes):
+    return pd.ExcelFile(BytesIO(file_bytes), engine='calamine').sheet_names
+
+@st.cache_data(show_spinner=False)
+def load_sheet(file_bytes, sheet=0):
+    # Keyed on the file contents, so widget reruns reuse the parsed frame
+    return pd.read_excel(BytesIO(file_bytes), sheet_name=sheet, engine='calamine')
+
 if uploaded_dynamic and uploaded_reference:
     try:
         # Load dynamic file
-        dynamic_excel = pd.ExcelFile(uploaded_dynamic, engine='openpyxl')
-        sheet_names = dynamic_excel.sheet_names
+        dynamic_bytes = uploaded_dynamic.getvalue()
+        sheet_names = load_sheet_names(dynamic_bytes)
         selected_sheet = st.selectbox("Select Sheet from Dynamic File", sheet_names)
-        dynamic_df = dynamic_excel.parse(selected_sheet)
+        dynamic_df = load_sheet(dynamic_bytes, selected_sheet)
 
         # Load reference file
-        reference_df = pd.read_excel(uploaded_reference, sheet_name=0, engine='openpyxl')
+        reference_df = load_sheet(uploaded_reference.getvalue(), 0)
 
         # Fuzzy match for Style and Customer Department
-        dynamic_columns = dynamic_df.columns.astype(str).tolist()
+        # Headers are normally strings already; only convert when some aren't
+        if dynamic_df.columns.inferred_type == 'string':
+            dynamic_columns = dynamic_df.columns.tolist()
+        else:
+            dynamic_columns = dynamic_df.columns.astype(str).tolist()
         style_keywords = ['Style', 'Style #', 'Style No', 'Style number']
         customer_keywords = ['Customer Department', 'Department', 'Buying Office', 'Customer']
 
@@ -52,13 +75,26 @@ if uploaded_dynamic and uploaded_reference:
         customer_col = st.selectbox("Select Customer Department Column", matched_customer if matched_customer else dynamic_columns)
 
         if st.button("Map Subchassis"):
-            # Prepare keys for join
-            dynamic_df['join_key'] = dynamic_df[style_col].astype(str).str.strip() + "_" + dynamic_df[customer_col].astype(str).str.strip()
-            reference_df['join_key'] = reference_df['Style'].astype(str).str.strip() + "_" + reference_df['Department'].astype(str).str.strip()
+            # Prepare keys for join: one normalised column per key, no concatenated string
+            join_keys = ['_k1', '_k2']
+            for key, dynamic_col, reference_col in zip(join_keys, [style_col, customer_col], ['Style', 'Department']):
+                # Arrow-backed strings keep the strip on a contiguous UTF-8 buffer
+                dynamic_key = dynamic_df[dynamic_col].astype('string[pyarrow]').str.strip()
+                reference_key = reference_df[reference_col].astype('string[pyarrow]').str.strip()
+
+                # Categorical keys with shared categories let the merge compare integer codes.
+                # Categories cover both sides so blank keys stay the only missing codes.
+                key_dtype = pd.CategoricalDtype(categories=pd.concat([dynamic_key, reference_key]).dropna().unique())
+                dynamic_df[key] = dynamic_key.astype(key_dtype)
+                reference_df[key] = reference_key.astype(key_dtype)
+
+            # Drop any LatestSubChassis already in the planning sheet so the merge doesn't suffix it
+            if 'LatestSubChassis' in dynamic_df.columns:
+                dynamic_df = dynamic_df.drop(columns=['LatestSubChassis'])
 
             # Merge data
-            merged_df = pd.merge(dynamic_df, reference_df[['join_key', 'LatestSubChassis']], on='join_key', how='left')
-            merged_df.drop(columns=['join_key'], inplace=True)
+            merged_df = pd.merge(dynamic_df, reference_df[join_keys + ['LatestSubChassis']], on=join_keys, how='left')
+            merged_df.drop(columns=join_keys, inplace=True)
 
             # Reorder columns to place LatestSubChassis at the end
             cols = [col for col in merged_df.columns if col != 'LatestSubChassis'] + ['LatestSubChassis']
@@ -66,7 +102,7 @@ if uploaded_dynamic and uploaded_reference:
 
             # Download button
             output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            with pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
                 merged_df.to_excel(writer, index=False, sheet_name='Mapped Data')
             st.download_button(
                 label="Download Mapped Excel File",